@@ -104,6 +104,36 @@ def show_history(assistant: DocumentAssistant):
         print("-"*60)
 
 
+def stream_reply(assistant: DocumentAssistant, user_input: str):
+    """Print the response text while it streams; return the final result and the text shown"""
+    streamed = ""
+    for event in assistant.stream_message(user_input):
+        if event["type"] == "final":
+            return event, streamed
+        
+        text = event["text"]
+        if not streamed:
+            print("\n🤖 Assistant:", end=" ")
+            print(text, end="", flush=True)
+        elif text.startswith(streamed):
+            print(text[len(streamed):], end="", flush=True)
+        else:
+            # A later LLM pass rewrote the text; show the new version on its own line
+            print("\n" + text, end="", flush=True)
+        streamed = text
+    return {"success": False, "error": "No response", "response": None}, streamed
+
+
+def print_final_text(text: str, streamed: str):
+    """Finish the response text, reprinting it only if it differs from what streamed"""
+    if not streamed:
+        print(text)
+    elif text == streamed:
+        print()
+    else:
+        print("\n" + text)
+
+
 def main():
     """Main interactive loop"""
     # Load environment variables
@@ -163,29 +193,31 @@ def main():
                 print(f"LOGS EXPORTED TO {log_file}", color='blue')
                 continue
             
-            # Process the message
+            # Process the message, showing the response text as it streams in
             print("\nProcessing...", color='yellow')
-            result = assistant.process_message(user_input)
+            result, streamed = stream_reply(assistant, user_input)
             
             if result["success"]:
-                print("\n🤖 Assistant:", end=" ")
-                
                 response = result["response"]
+                if not streamed:
+                    print("\n🤖 Assistant:", end=" ")
                 if response:
                     if "answer" in response:
-                        print(response["answer"])
+                        print_final_text(response["answer"], streamed)
                         if response.get("sources"):
                             print(f"\nSOURCES: {', '.join(response['sources'])}", color='blue')
                     elif "summary" in response:
-                        print(response["summary"])
+                        print_final_text(response["summary"], streamed)
                         if response.get("key_points"):
                             print("\nKEY POINTS:", color='blue')
                             for point in response["key_points"]:
                                 print(f"  • {point}")
                     elif "explanation" in response:
-                        print(response["explanation"])
+                        print_final_text(response["explanation"], streamed)
                         if response.get("result") is not None:
                             print(f"\nRESULT: {response['result']}", color='blue')
+                elif streamed:
+                    print()
                 
                 if result.get("tools_used"):
                     print(f"\nTOOLS USED: {', '.join(result['tools_used'])}", color='magenta')
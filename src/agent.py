@@ -1,8 +1,8 @@
 """LangGraph workflow nodes and routing for the Document Assistant.
 
-Defines the `AgentState` (graph state), node functions for intent
-classification and task handling, memory updates, and `create_workflow` to
-assemble and compile the StateGraph.
+Defines the `AgentState` (graph state), node functions for request routing,
+intent classification and task handling, memory updates, and
+`create_workflow` to assemble and compile the StateGraph.
 
 Example:
     from langchain_openai import ChatOpenAI
@@ -21,7 +21,8 @@ Example:
         "messages": [],
         "user_input": "Summarize all contracts",
         "intent": None,
-        "next_step": "classify_intent",
+        "next_step": "route_request",
+        "planned_tool_calls": [],
         "conversation_history": [],
         "conversation_summary": "",
         "active_documents": [],
@@ -35,14 +36,60 @@ Example:
 from typing import TypedDict, Annotated, List, Dict, Any, Optional, Literal
 from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
-from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
+from langchain_core.utils.json import parse_partial_json
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage, ToolMessage
+from concurrent.futures import Future, ThreadPoolExecutor
+from types import MappingProxyType
+from collections import OrderedDict
+from datetime import datetime
+from pydantic import BaseModel, ValidationError
+import hashlib
+import json
+import logging
+import math
 import re
+import threading
 
 from schemas import (
-    UserIntent, ConversationTurn, SessionState,
+    UserIntent, IntentBatch, ConversationTurn, SessionState,
     AnswerResponse, SummarizationResponse, CalculationResponse
 )
-from prompts import get_intent_classification_prompt, get_chat_prompt_template
+from prompts import get_intent_letter_prompt, get_batch_intent_classification_prompt, get_chat_prompt_template
+from tools import get_routing_tools
+
+logger = logging.getLogger(__name__)
+
+# Built once at import; the template is identical for every turn
+_INTENT_PROMPT = get_intent_letter_prompt()
+_BATCH_INTENT_PROMPT = get_batch_intent_classification_prompt()
+
+# One-letter answers of the single-request intent classifier
+_INTENT_LETTERS = {"Q": "qa", "S": "summarization", "C": "calculation", "U": "unknown"}
+
+# Response fields holding the assistant's text, in lookup order
+_ASSIST_KEYS = ("answer", "summary", "explanation")
+
+# Pattern for document IDs in tool output
+_ID_RE = re.compile(r'ID: ([\w-]+)')
+
+# History replayed to the LLM is capped by an approximate token budget, and
+# tool results above the per-result limit are replaced by a short placeholder
+_HISTORY_TOKEN_BUDGET = 4000
+_TOOL_RESULT_TOKEN_LIMIT = 1000
+
+# Responses to repeated questions with the intent they were routed to, keyed
+# by session, normalized input and the active document set (so a changed
+# document context misses). The key needs no intent, so it is checked before
+# any routing call is made
+_RESPONSE_CACHE_SIZE = 128
+_response_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_response_cache_lock = threading.Lock()
+
+# Compiled workflows keyed by the identity of the llm and tools they were
+# built from (LangChain models and tools aren't hashable)
+_COMPILED_GRAPH_CACHE_SIZE = 16
+_compiled_graph_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_compiled_graph_cache_lock = threading.Lock()
 
 # The AgentState class is already implemented for you. 
 # Study the structure to understand how state flows through the LangGraph workflow.
@@ -58,6 +105,7 @@ class AgentState(TypedDict):
     # Intent and routing
     intent: Optional[UserIntent]
     next_step: str
+    planned_tool_calls: List[Dict[str, Any]]
     
     # Memory and context
     conversation_history: List[ConversationTurn]
@@ -72,55 +120,169 @@ class AgentState(TypedDict):
     session_id: str
     user_id: str
 
-# TODO: Implement the classify_intent function.
-# This function should classify the user's intent and set the next step in the workflow.
-# Refer to README.md Task 2.2 for detailed implementation requirements.
-def classify_intent(state: AgentState, llm) -> AgentState:
+
+def _execute_tool_calls(calls: List[tuple]) -> List[Any]:
     """
-    Classify user intent
+    Invoke (tool_call, tool, tool_args) triples concurrently.
+
+    Tool calls are I/O bound, so a thread pool cuts the wall time to roughly the
+    slowest call. Results are returned in submission order.
     """
-    # Format conversation history (simple text, last few turns)
-    history_text = ""
-    for turn in state.get("conversation_history", [])[-5:]:
-        history_text += f"User: {turn.user_input}\n"
-        if isinstance(turn.agent_response, dict):
-            if "answer" in turn.agent_response:
-                history_text += f"Assistant: {turn.agent_response['answer']}\n"
-            elif "summary" in turn.agent_response:
-                history_text += f"Assistant: {turn.agent_response['summary']}\n"
-            elif "explanation" in turn.agent_response:
-                history_text += f"Assistant: {turn.agent_response['explanation']}\n"
-
-    # Get prompt and structured LLM
-    prompt = get_intent_classification_prompt()
-    structured_llm = llm.with_structured_output(UserIntent)
-
-    # Create prompt input
-    prompt_input = prompt.format(
-        user_input=state["user_input"],
-        conversation_history=history_text or state.get("conversation_summary", ""),
-    )
+    if not calls:
+        return []
+    if len(calls) == 1:
+        _, tool, tool_args = calls[0]
+        return [tool.invoke(tool_args)]
 
-    intent: UserIntent = structured_llm.invoke(prompt_input)
-    state["intent"] = intent
+    with ThreadPoolExecutor(max_workers=min(8, len(calls))) as executor:
+        futures = [executor.submit(tool.invoke, tool_args) for _, tool, tool_args in calls]
+        return [future.result() for future in futures]
 
-    # Route next step
-    mapping = {
-        "qa": "qa_agent",
-        "summarization": "summarization_agent",
-        "calculation": "calculation_agent",
-    }
-    state["next_step"] = mapping.get(intent.intent_type, "qa_agent")
-    return state
+
+def _tool_text(tool_result: Any) -> str:
+    """
+    Render a tool result as ToolMessage content (structured results as JSON)
+    """
+    if isinstance(tool_result, str):
+        return tool_result
+    if isinstance(tool_result, dict):
+        return json.dumps(tool_result)
+    return str(tool_result)
 
 
-def qa_agent(state: AgentState, llm, tools) -> AgentState:
+def _approx_tokens(msg: BaseMessage) -> int:
     """
-    Handle Q&A tasks
+    Estimate a message's token count (~4 characters per token)
     """
-    messages = []
-    
-    system_msg = f"""You are a helpful document assistant. 
+    chars = len(str(msg.content)) + len(str(getattr(msg, "tool_calls", None) or ""))
+    return chars // 4 + 1
+
+
+def _select_messages(msgs: List[BaseMessage], max_tokens: int = _HISTORY_TOKEN_BUDGET) -> List[BaseMessage]:
+    """
+    Select the most recent messages that fit within a token budget.
+
+    System messages are always kept. Oversized tool results are swapped for a
+    placeholder, and tool results whose tool call fell outside the window are
+    dropped so the history stays valid for the provider.
+    """
+    system = [m for m in msgs if isinstance(m, SystemMessage)]
+    budget = max_tokens - sum(_approx_tokens(m) for m in system)
+
+    selected = []
+    for msg in reversed(msgs):
+        if isinstance(msg, SystemMessage):
+            continue
+        if isinstance(msg, ToolMessage) and _approx_tokens(msg) > _TOOL_RESULT_TOKEN_LIMIT:
+            text = str(msg.content)
+            msg = ToolMessage(
+                content=f"[Tool result for {msg.name or 'tool'}: {len(text)} chars, "
+                        f"{len(set(_ID_RE.findall(text)))} docs found]",
+                tool_call_id=msg.tool_call_id,
+                name=msg.name,
+            )
+        cost = _approx_tokens(msg)
+        if cost > budget:
+            break
+        budget -= cost
+        selected.append(msg)
+    selected.reverse()
+
+    while selected and isinstance(selected[0], ToolMessage):
+        selected.pop(0)
+    return system + selected
+
+
+def _response_cache_key(state: AgentState, active_documents: List[str]) -> tuple:
+    """
+    Build the response cache key for the current input
+    """
+    digest = hashlib.sha1(state["user_input"].strip().lower().encode()).hexdigest()
+    return (state.get("session_id"), digest, frozenset(active_documents))
+
+
+def _cached_response(state: AgentState) -> Optional[tuple]:
+    """
+    Look up a previous (intent, response) for the same question in this session.
+
+    The returned response is a copy with its timestamp set to now.
+    """
+    key = _response_cache_key(state, state.get("active_documents", []))
+    with _response_cache_lock:
+        entry = _response_cache.get(key)
+        if entry is None:
+            return None
+        _response_cache.move_to_end(key)
+    intent, response = entry
+    response = dict(response)
+    if "timestamp" in response:
+        response["timestamp"] = datetime.now()
+    return intent, response
+
+
+def _store_response(state: AgentState, active_documents: List[str]) -> None:
+    """
+    Remember the turn's response, evicting the least recently used entry when full
+    """
+    key = _response_cache_key(state, active_documents)
+    with _response_cache_lock:
+        _response_cache[key] = (state["intent"], dict(state["current_response"]))
+        _response_cache.move_to_end(key)
+        if len(_response_cache) > _RESPONSE_CACHE_SIZE:
+            _response_cache.popitem(last=False)
+
+
+def _direct_response(tool_response, schema: type[BaseModel]) -> Optional[BaseModel]:
+    """
+    Return the structured response if the model called only the response schema.
+
+    The schema is bound as a tool next to the document tools, so queries that
+    need no lookup are answered in a single round-trip.
+    """
+    tool_calls = getattr(tool_response, "tool_calls", None) or []
+    if len(tool_calls) != 1 or tool_calls[0]["name"] != schema.__name__:
+        return None
+    try:
+        return schema(**tool_calls[0]["args"])
+    except ValidationError:
+        return None
+
+
+# Text field of each response schema, used to surface partial output while streaming
+_RESPONSE_TEXT_FIELDS = {
+    AnswerResponse.__name__: "answer",
+    SummarizationResponse.__name__: "summary",
+    CalculationResponse.__name__: "explanation",
+}
+
+
+def partial_response_text(message: BaseMessage) -> Optional[str]:
+    """
+    Extract the response text from a (possibly partial) structured response.
+
+    Direct responses arrive as tool calls whose arguments are parsed from the
+    JSON streamed so far; the final JSON-schema pass streams the JSON as
+    message content instead. Either way the text grows as tokens come in.
+    """
+    for tool_call in getattr(message, "tool_calls", None) or []:
+        field = _RESPONSE_TEXT_FIELDS.get(tool_call["name"])
+        if field and isinstance(tool_call["args"].get(field), str):
+            return tool_call["args"][field]
+
+    content = message.content
+    if isinstance(content, str) and content.lstrip().startswith("{"):
+        parsed = parse_partial_json(content)
+        if isinstance(parsed, dict):
+            text = next((parsed[k] for k in _ASSIST_KEYS if k in parsed), None)
+            if isinstance(text, str):
+                return text
+    return None
+
+
+# Static agent instructions. Keeping these free of per-turn values means the
+# leading system message is byte-identical across turns, so providers with
+# prompt caching (OpenAI's automatic prefix cache) can reuse it.
+_QA_STATIC_SYS = """You are a helpful document assistant. 
 
 IMPORTANT TOOL USAGE INSTRUCTIONS:
 1. For document_search tool, you MUST provide:
@@ -144,264 +306,545 @@ IMPORTANT TOOL USAGE INSTRUCTIONS:
 
 Always search for documents first before answering questions about their content.
 Cite your sources by document ID.
+If no document lookup is needed, call AnswerResponse directly with your final answer.
+"""
+
+_SUM_STATIC_SYS = """You are an expert document summarizer.
+
+IMPORTANT TOOL USAGE INSTRUCTIONS:
+1. For document_search tool, you MUST provide:
+   - query: Your search query (REQUIRED - use terms from the user's request)
+   - search_type: Either "keyword" (default), "type", or "amount_range"
+
+2. For document_reader tool, you MUST provide:
+   - doc_id: The exact document ID to read (REQUIRED)
+
+First search for relevant documents, then read them to create comprehensive summaries.
+Extract key points and cite document IDs.
+If you already have the document content you need, call SummarizationResponse directly.
+"""
+
+_CALC_STATIC_SYS = """You are a precise calculator assistant.
+
+IMPORTANT TOOL USAGE INSTRUCTIONS:
+1. For calculator tool, you MUST provide:
+   - expression: The mathematical expression to evaluate (REQUIRED)
+
+2. For document_search tool (to find numbers), you MUST provide:
+   - query: Your search query (REQUIRED - use terms related to the numbers you need)
 
-Current conversation context: {state.get('conversation_summary', 'No previous context')}
+3. For document_reader tool, you MUST provide:
+   - doc_id: The exact document ID to read (REQUIRED)
 
-User question: {state["user_input"]}
+Search documents first if you need to find specific numbers, then use the calculator.
+Show your work step by step.
+If no lookup or calculator call is needed, call CalculationResponse directly.
 """
-    messages.append(SystemMessage(content=system_msg))
+
+
+# Routing pseudo-tool name -> (intent type, next node)
+_ROUTES = {
+    "answer_question": ("qa", "qa_agent"),
+    "summarize": ("summarization", "summarization_agent"),
+    "calculate": ("calculation", "calculation_agent"),
+}
+
+_ROUTER_STATIC_SYS = """You are the request router for a document assistant that works with invoices, contracts and claims.
+
+Call exactly one routing tool for the user's request:
+- answer_question: a specific question to be answered from documents
+- summarize: a request to summarize one or more documents
+- calculate: a request to compute, total, add, subtract, multiply, divide or otherwise calculate values
+
+In the same response, also call any document tools the request will need
+(document_search, document_reader, document_statistics, calculator) so their
+results are ready for the next step. For document_search you MUST provide a
+query; for document_reader, the exact doc_id.
+"""
+
+
+def _parse_intent_letter(message: AIMessage) -> UserIntent:
+    """
+    Turn a one-token classification into a `UserIntent`.
+
+    The confidence is the probability of the best intent letter among the
+    returned top logprobs. Without logprobs the completion text is used with
+    a neutral confidence. `reasoning` is only filled in when debug logging is
+    enabled.
+    """
+    candidates = []
+    logprobs = (message.response_metadata.get("logprobs") or {}).get("content") or []
+    if logprobs:
+        first = logprobs[0]
+        for entry in first.get("top_logprobs") or [first]:
+            letter = entry["token"].strip().upper()
+            if letter in _INTENT_LETTERS:
+                candidates.append((letter, math.exp(entry["logprob"])))
+    if candidates:
+        letter, confidence = max(candidates, key=lambda c: c[1])
+    else:
+        letter, confidence = str(message.content).strip().upper()[:1], 0.5
+
+    reasoning = ""
+    if logger.isEnabledFor(logging.DEBUG):
+        if candidates:
+            reasoning = "Top tokens: " + ", ".join(f"{l}={p:.2f}" for l, p in candidates)
+        else:
+            reasoning = f"Completion: {message.content!r}"
+    return UserIntent(
+        intent_type=_INTENT_LETTERS.get(letter, "unknown"),
+        confidence=min(confidence, 1.0),
+        reasoning=reasoning,
+    )
+
+
+class IntentClassifierBatcher:
+    """
+    Coalesces concurrent intent classifications into one LLM call.
+
+    The first caller to arrive becomes the leader. If other classifications
+    are already in flight, it waits up to `max_wait` seconds (or until
+    `max_batch_size` requests are queued) for more to join; otherwise there is
+    no concurrent traffic to batch with and it proceeds at once. Everything
+    queued is split into even chunks of at most `max_batch_size`, the chunks
+    are classified in parallel with one enumerated prompt each, and each
+    caller gets its result through a future. A lone request is classified
+    with a single token by `intent_llm` (see `_parse_intent_letter`).
+    """
+
+    def __init__(self, intent_llm, batch_llm, max_batch_size: int = 8, max_wait: float = 0.05):
+        self.intent_llm = intent_llm
+        self.batch_llm = batch_llm
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._pending: List[tuple] = []
+        self._in_flight = 0
+        self._batch_full = threading.Event()
+
+    def classify(self, user_input: str, history_text: str) -> UserIntent:
+        future: Future = Future()
+        with self._lock:
+            self._in_flight += 1
+            self._pending.append((user_input, history_text, future))
+            is_leader = len(self._pending) == 1
+            concurrent = self._in_flight > 1
+            if len(self._pending) >= self.max_batch_size:
+                self._batch_full.set()
+
+        try:
+            if is_leader:
+                if concurrent:
+                    self._batch_full.wait(self.max_wait)
+                with self._lock:
+                    batch, self._pending = self._pending, []
+                    self._batch_full.clear()
+                self._flush(batch)
+            return future.result()
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _flush(self, batch: List[tuple]) -> None:
+        n_chunks = -(-len(batch) // self.max_batch_size)
+        size = -(-len(batch) // n_chunks)
+        chunks = [batch[i:i + size] for i in range(0, len(batch), size)]
+        if len(chunks) == 1:
+            self._run(chunks[0])
+            return
+        with ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+            list(executor.map(self._run, chunks))
+
+    def _run(self, batch: List[tuple]) -> None:
+        try:
+            if len(batch) == 1:
+                user_input, history_text, future = batch[0]
+                message = self.intent_llm.invoke(_INTENT_PROMPT.format(
+                    user_input=user_input,
+                    conversation_history=history_text,
+                ))
+                future.set_result(_parse_intent_letter(message))
+                return
+
+            requests = "\n\n".join(
+                f"Request {i}:\nConversation History:\n{history_text}\n\nUser Input:\n{user_input}"
+                for i, (user_input, history_text, _) in enumerate(batch, 1)
+            )
+            result: IntentBatch = self.batch_llm.invoke(_BATCH_INTENT_PROMPT.format(requests=requests))
+            if len(result.intents) != len(batch):
+                # Can't tell which classification belongs to which request
+                for item in batch:
+                    self._run([item])
+                return
+            for (_, _, future), intent in zip(batch, result.intents):
+                future.set_result(intent)
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+
+# TODO: Implement the classify_intent function.
+# This function should classify the user's intent and set the next step in the workflow.
+# Refer to README.md Task 2.2 for detailed implementation requirements.
+def classify_intent(state: AgentState, batcher: IntentClassifierBatcher) -> AgentState:
+    """
+    Classify user intent.
+
+    Classification goes through `batcher`, which shares one LLM call between
+    requests classified at the same time.
+    """
+    # Format conversation history (simple text, last few turns)
+    parts = []
+    for turn in state.get("conversation_history", [])[-5:]:
+        parts.append(f"User: {turn.user_input}")
+        if isinstance(turn.agent_response, dict):
+            text = next((turn.agent_response[k] for k in _ASSIST_KEYS if k in turn.agent_response), None)
+            if text:
+                parts.append(f"Assistant: {text}")
+    history_text = "\n".join(parts)
+
+    intent = batcher.classify(state["user_input"], history_text or state.get("conversation_summary", ""))
+    state["intent"] = intent
+
+    # Route next step
+    mapping = {
+        "qa": "qa_agent",
+        "summarization": "summarization_agent",
+        "calculation": "calculation_agent",
+    }
+    state["next_step"] = mapping.get(intent.intent_type, "qa_agent")
+    return state
+
+
+def route_request(state: AgentState, router_llm, intent_batcher) -> AgentState:
+    """
+    Pick the task and the document tools it needs in a single LLM call.
+
+    `router_llm` has the routing pseudo-tools (see `get_routing_tools`) and the
+    document tools bound. The routing tool the model calls sets the intent, and
+    any document tool calls are passed on as `planned_tool_calls`, so the agent
+    skips its own tool-decision call. If no routing tool is called, the request
+    falls back to `classify_intent`.
+
+    If the same question was already answered in this session with the same
+    active documents, the cached response and intent are reused, and both the
+    routing call and the agent are skipped.
+    """
+    cached = _cached_response(state)
+    if cached is not None:
+        state["intent"], state["current_response"] = cached
+        state["planned_tool_calls"] = []
+        state["tools_used"] = []
+        state["next_step"] = "update_memory"
+        return state
+
+    messages = [
+        SystemMessage(content=_ROUTER_STATIC_SYS),
+        SystemMessage(
+            content=f"Current conversation context: {state.get('conversation_summary', 'No previous context')}"
+        ),
+    ]
+    messages.extend(_select_messages(state.get("messages", [])))
+    messages.append(HumanMessage(content=state["user_input"]))
+
+    response = router_llm.invoke(messages)
+    tool_calls = getattr(response, "tool_calls", None) or []
+    route_call = next((tc for tc in tool_calls if tc["name"] in _ROUTES), None)
+
+    if route_call is None:
+        # The model didn't pick a route; use the dedicated classifier instead
+        state = classify_intent(state, intent_batcher)
+        state["planned_tool_calls"] = []
+    else:
+        intent_type, next_step = _ROUTES[route_call["name"]]
+        # The routing tools aren't strict, so the confidence may be missing or malformed
+        try:
+            confidence = min(max(float(route_call["args"].get("confidence", 0.5)), 0.0), 1.0)
+        except (TypeError, ValueError):
+            confidence = 0.5
+        if math.isnan(confidence):
+            confidence = 0.5
+        state["intent"] = UserIntent(
+            intent_type=intent_type,
+            confidence=confidence,
+            reasoning=f"Routed by the {route_call['name']} tool",
+        )
+        state["next_step"] = next_step
+        state["planned_tool_calls"] = [tc for tc in tool_calls if tc["name"] not in _ROUTES]
+    return state
+
+
+def qa_agent(state: AgentState, llm_with_tools, structured_llm, tools_by_name) -> AgentState:
+    """
+    Handle Q&A tasks.
+
+    Agents receive runnables pre-bound in `create_workflow`: `llm_with_tools`
+    has the tools plus the response schema bound, `structured_llm` returns the
+    response schema for the final pass.
+    """
+    messages = []
+    
+    messages.append(SystemMessage(content=_QA_STATIC_SYS))
+    # Per-turn context goes after the static block so the prompt prefix stays cacheable
+    messages.append(SystemMessage(
+        content=f"Current conversation context: {state.get('conversation_summary', 'No previous context')}"
+    ))
     
     # Add conversation history
-    for msg in state.get("messages", [])[-4:]:  # Last 4 messages
+    for msg in _select_messages(state.get("messages", [])):  # Most recent that fit the budget
         messages.append(msg)
     
     messages.append(HumanMessage(content=state["user_input"]))
     
-    llm_with_tools = llm.bind_tools(tools)
-    
-    tool_response = llm_with_tools.invoke(messages)
-    messages.append(tool_response)
-    
-    # Process tool calls
     sources = []
     tools_used = []
     
-    if hasattr(tool_response, 'tool_calls') and tool_response.tool_calls:
-        for tool_call in tool_response.tool_calls:
-            # Find the matching tool and execute it
-            tool_name = tool_call['name']
-            tool_args = tool_call['args']
-            
-            # Ensure required args are present for document_search
-            if tool_name == "document_search" and "query" not in tool_args:
-                # Extract query from user input if not provided
-                tool_args["query"] = state["user_input"]
-            
-            # Find the tool
-            matching_tool = next((t for t in tools if t.name == tool_name), None)
-            if matching_tool:
-                # Execute the tool
-                tool_result = matching_tool.invoke(tool_args)
-                tools_used.append(tool_name)
-                
-                # Extract document IDs from results
-                doc_ids = re.findall(r'ID: ([\w-]+)', str(tool_result))
-                sources.extend(doc_ids)
-                
-                # Add tool result to messages
-                from langchain_core.messages import ToolMessage
-                messages.append(ToolMessage(
-                    content=str(tool_result),
-                    tool_call_id=tool_call.get('id', tool_name)
-                ))
-    
-    # Get the structured output
-    structured_llm = llm.with_structured_output(AnswerResponse)
-    
-    # Create a prompt for the final response
-    final_prompt = f"""Based on the tool results and conversation, provide a comprehensive answer to: {state['user_input']}
-    
-    Include the document IDs you referenced as sources."""
-    
-    messages.append(HumanMessage(content=final_prompt))
+    # Reuse the tool calls planned by the router instead of asking again
+    if state.get("planned_tool_calls"):
+        tool_response = AIMessage(content="", tool_calls=state["planned_tool_calls"])
+    else:
+        tool_response = llm_with_tools.invoke(messages)
+    messages.append(tool_response)
     
-    # Get structured response
-    response = structured_llm.invoke(messages)
+    # Process tool calls
+    calls = []
+    
+    for tool_call in getattr(tool_response, 'tool_calls', None) or []:
+        # Find the matching tool
+        tool_name = tool_call['name']
+        tool_args = tool_call['args']
+        
+        # Ensure required args are present for document_search
+        if tool_name == "document_search" and "query" not in tool_args:
+            # Extract query from user input if not provided
+            tool_args["query"] = state["user_input"]
+        
+        matching_tool = tools_by_name.get(tool_name)
+        if matching_tool:
+            calls.append((tool_call, matching_tool, tool_args))
+        elif tool_name == AnswerResponse.__name__:
+            # Answer every tool call id so the follow-up request stays valid
+            messages.append(ToolMessage(
+                content="Waiting for tool results before the final response.",
+                tool_call_id=tool_call.get('id', tool_name)
+            ))
+    
+    # Execute the tools concurrently, then handle results in call order
+    for (tool_call, _, tool_args), tool_result in zip(calls, _execute_tool_calls(calls)):
+        tool_name = tool_call['name']
+        tools_used.append(tool_name)
+        tool_text = _tool_text(tool_result)
+        
+        # Extract document IDs from results
+        doc_ids = _ID_RE.findall(tool_text)
+        sources.extend(doc_ids)
+        
+        # Add tool result to messages
+        messages.append(ToolMessage(
+            content=tool_text,
+            tool_call_id=tool_call.get('id', tool_name)
+        ))
+    
+    # Skip the second round-trip when the model answered directly
+    response = _direct_response(tool_response, AnswerResponse)
+    if response is None:
+        # Create a prompt for the final response
+        final_prompt = f"""Based on the tool results and conversation, provide a comprehensive answer to: {state['user_input']}
+        
+        Include the document IDs you referenced as sources."""
+        
+        messages.append(HumanMessage(content=final_prompt))
+        
+        # Get structured response
+        response = structured_llm.invoke(messages)
     
     # Ensure sources are populated
     if not response.sources and sources:
         response.sources = list(set(sources))
     
-    state["current_response"] = response.dict()
+    state["current_response"] = response.model_dump()
     state["tools_used"] = tools_used
     state["next_step"] = "update_memory"
     
     return state
 
 
-def summarization_agent(state: AgentState, llm, tools) -> AgentState:
+def summarization_agent(state: AgentState, llm_with_tools, structured_llm, tools_by_name) -> AgentState:
     """
     Handle summarization tasks
     """
     messages = []
     
     # System message with explicit tool instructions
-    system_msg = f"""You are an expert document summarizer.
-
-IMPORTANT TOOL USAGE INSTRUCTIONS:
-1. For document_search tool, you MUST provide:
-   - query: Your search query (REQUIRED - use terms from the user's request)
-   - search_type: Either "keyword" (default), "type", or "amount_range"
-
-2. For document_reader tool, you MUST provide:
-   - doc_id: The exact document ID to read (REQUIRED)
-
-First search for relevant documents, then read them to create comprehensive summaries.
-Extract key points and cite document IDs.
-
-Current conversation context: {state.get('conversation_summary', 'No previous context')}
-
-User request: {state["user_input"]}
-"""
-    messages.append(SystemMessage(content=system_msg))
+    messages.append(SystemMessage(content=_SUM_STATIC_SYS))
+    messages.append(SystemMessage(
+        content=f"Current conversation context: {state.get('conversation_summary', 'No previous context')}"
+    ))
     
     # Add conversation history
-    for msg in state.get("messages", [])[-4:]:
+    for msg in _select_messages(state.get("messages", [])):
         messages.append(msg)
     
     # Add current request
     messages.append(HumanMessage(content=state["user_input"]))
     
-    # Use tools to gather documents
-    llm_with_tools = llm.bind_tools(tools)
-    tool_response = llm_with_tools.invoke(messages)
+    # Use tools to gather documents, reusing the calls planned by the router
+    if state.get("planned_tool_calls"):
+        tool_response = AIMessage(content="", tool_calls=state["planned_tool_calls"])
+    else:
+        tool_response = llm_with_tools.invoke(messages)
     messages.append(tool_response)
     
     # Process tool calls
     doc_ids = []
     tools_used = []
     original_content_length = 0
-    
-    if hasattr(tool_response, 'tool_calls') and tool_response.tool_calls:
-        for tool_call in tool_response.tool_calls:
-            tool_name = tool_call['name']
-            tool_args = tool_call['args']
-            
-            # Ensure required args are present
-            if tool_name == "document_search" and "query" not in tool_args:
-                # Extract key terms from user input for search
-                tool_args["query"] = " ".join(state["user_input"].split()[:5])
-            
-            matching_tool = next((t for t in tools if t.name == tool_name), None)
-            if matching_tool:
-                tool_result = matching_tool.invoke(tool_args)
-                tools_used.append(tool_name)
-                
-                # Extract document IDs and estimate content length
-                doc_ids.extend(re.findall(r'ID: ([\w-]+)', str(tool_result)))
-                original_content_length += len(str(tool_result))
-                
-                from langchain_core.messages import ToolMessage
-                messages.append(ToolMessage(
-                    content=str(tool_result),
-                    tool_call_id=tool_call.get('id', tool_name)
-                ))
-    
-    # Get structured summary
-    structured_llm = llm.with_structured_output(SummarizationResponse)
-    
-    final_prompt = f"""Based on the documents you've read, create a comprehensive summary for: {state['user_input']}
-    
-    Extract 3-5 key points and include the document IDs you summarized."""
-    
-    messages.append(HumanMessage(content=final_prompt))
-    
-    response = structured_llm.invoke(messages)
+    calls = []
+    
+    for tool_call in getattr(tool_response, 'tool_calls', None) or []:
+        tool_name = tool_call['name']
+        tool_args = tool_call['args']
+        
+        # Ensure required args are present
+        if tool_name == "document_search" and "query" not in tool_args:
+            # Extract key terms from user input for search
+            tool_args["query"] = " ".join(state["user_input"].split()[:5])
+        
+        matching_tool = tools_by_name.get(tool_name)
+        if matching_tool:
+            calls.append((tool_call, matching_tool, tool_args))
+        elif tool_name == SummarizationResponse.__name__:
+            # Answer every tool call id so the follow-up request stays valid
+            messages.append(ToolMessage(
+                content="Waiting for tool results before the final response.",
+                tool_call_id=tool_call.get('id', tool_name)
+            ))
+    
+    for (tool_call, _, tool_args), tool_result in zip(calls, _execute_tool_calls(calls)):
+        tool_name = tool_call['name']
+        tools_used.append(tool_name)
+        tool_text = _tool_text(tool_result)
+        
+        # Extract document IDs and estimate content length
+        doc_ids.extend(_ID_RE.findall(tool_text))
+        original_content_length += len(tool_text)
+        
+        messages.append(ToolMessage(
+            content=tool_text,
+            tool_call_id=tool_call.get('id', tool_name)
+        ))
+    
+    response = _direct_response(tool_response, SummarizationResponse)
+    if response is None:
+        # Get structured summary
+        final_prompt = f"""Based on the documents you've read, create a comprehensive summary for: {state['user_input']}
+        
+        Extract 3-5 key points and include the document IDs you summarized."""
+        
+        messages.append(HumanMessage(content=final_prompt))
+        
+        response = structured_llm.invoke(messages)
     
     if not response.document_ids and doc_ids:
         response.document_ids = list(set(doc_ids))
     if response.original_length == 0:
         response.original_length = original_content_length
     
-    state["current_response"] = response.dict()
+    state["current_response"] = response.model_dump()
     state["tools_used"] = tools_used
     state["next_step"] = "update_memory"
     
     return state
 
 
-def calculation_agent(state: AgentState, llm, tools) -> AgentState:
+def calculation_agent(state: AgentState, llm_with_tools, structured_llm, tools_by_name) -> AgentState:
     """
     Handle calculation tasks
     """
     messages = []
     
     # System message with tool instructions
-    system_msg = f"""You are a precise calculator assistant.
-
-IMPORTANT TOOL USAGE INSTRUCTIONS:
-1. For calculator tool, you MUST provide:
-   - expression: The mathematical expression to evaluate (REQUIRED)
-
-2. For document_search tool (to find numbers), you MUST provide:
-   - query: Your search query (REQUIRED - use terms related to the numbers you need)
-
-3. For document_reader tool, you MUST provide:
-   - doc_id: The exact document ID to read (REQUIRED)
-
-Search documents first if you need to find specific numbers, then use the calculator.
-Show your work step by step.
-
-Current conversation context: {state.get('conversation_summary', 'No previous context')}
-
-User request: {state["user_input"]}
-"""
-    messages.append(SystemMessage(content=system_msg))
+    messages.append(SystemMessage(content=_CALC_STATIC_SYS))
+    messages.append(SystemMessage(
+        content=f"Current conversation context: {state.get('conversation_summary', 'No previous context')}"
+    ))
     
     # Add conversation history
-    for msg in state.get("messages", [])[-4:]:
+    for msg in _select_messages(state.get("messages", [])):
         messages.append(msg)
     
     messages.append(HumanMessage(content=state["user_input"]))
     
-    llm_with_tools = llm.bind_tools(tools)
-    tool_response = llm_with_tools.invoke(messages)
+    if state.get("planned_tool_calls"):
+        tool_response = AIMessage(content="", tool_calls=state["planned_tool_calls"])
+    else:
+        tool_response = llm_with_tools.invoke(messages)
     messages.append(tool_response)
     
     expression = ""
-    calc_result = None
+    calc_results = []
     tools_used = []
-    
-    if hasattr(tool_response, 'tool_calls') and tool_response.tool_calls:
-        for tool_call in tool_response.tool_calls:
-            tool_name = tool_call['name']
-            tool_args = tool_call['args']
-            
-            # Ensure required args
-            if tool_name == "document_search" and "query" not in tool_args:
-                # Look for number-related keywords in user input
-                tool_args["query"] = "total amount sum calculate"
-            
-            matching_tool = next((t for t in tools if t.name == tool_name), None)
-            if matching_tool:
-                tool_result = matching_tool.invoke(tool_args)
-                tools_used.append(tool_name)
-                
-                if tool_name == "calculator":
-                    expression = tool_args.get("expression", "")
-                    # Extract result from output
-                    match = re.search(r'result.*?is\s*([\d.,]+)', str(tool_result))
-                    if match:
-                        calc_result = float(match.group(1).replace(',', ''))
-                
-                from langchain_core.messages import ToolMessage
-                messages.append(ToolMessage(
-                    content=str(tool_result),
-                    tool_call_id=tool_call.get('id', tool_name)
-                ))
-
-    # Generate structured response
-    structured_llm = llm.with_structured_output(CalculationResponse)
-
-    # Compose final prompt
-    final_prompt = f"""Based on the tool outputs and conversation, produce a clear calculation response for: {state['user_input']}
+    calls = []
+    
+    for tool_call in getattr(tool_response, 'tool_calls', None) or []:
+        tool_name = tool_call['name']
+        tool_args = tool_call['args']
+        
+        # Ensure required args
+        if tool_name == "document_search" and "query" not in tool_args:
+            # Look for number-related keywords in user input
+            tool_args["query"] = "total amount sum calculate"
+        
+        matching_tool = tools_by_name.get(tool_name)
+        if matching_tool:
+            calls.append((tool_call, matching_tool, tool_args))
+        elif tool_name == CalculationResponse.__name__:
+            # Answer every tool call id so the follow-up request stays valid
+            messages.append(ToolMessage(
+                content="Waiting for tool results before the final response.",
+                tool_call_id=tool_call.get('id', tool_name)
+            ))
+    
+    for (tool_call, _, tool_args), tool_result in zip(calls, _execute_tool_calls(calls)):
+        tool_name = tool_call['name']
+        tools_used.append(tool_name)
+        tool_text = _tool_text(tool_result)
+        
+        if tool_name == "calculator":
+            expression = tool_args.get("expression", "")
+            # The calculator returns its result as a number; errors carry no result
+            if isinstance(tool_result, dict) and tool_result.get("result") is not None:
+                calc_results.append((tool_args.get("expression", ""), tool_result["result"]))
+        
+        messages.append(ToolMessage(
+            content=tool_text,
+            tool_call_id=tool_call.get('id', tool_name)
+        ))
+
+    response = _direct_response(tool_response, CalculationResponse)
+    if response is None:
+        # Compose final prompt
+        final_prompt = f"""Based on the tool outputs and conversation, produce a clear calculation response for: {state['user_input']}
 
 Include:
 - expression used (if any),
 - step-by-step explanation of the calculation,
 - the numeric result.
 """
-    messages.append(HumanMessage(content=final_prompt))
+        messages.append(HumanMessage(content=final_prompt))
 
-    response = structured_llm.invoke(messages)
+        response = structured_llm.invoke(messages)
 
-    # If we already extracted calc_result or expression, ensure they are set
-    if expression and not response.expression:
+    # A single calculator result is authoritative over the model's restatement;
+    # with several sub-step results, the model's combined answer stands
+    if len(calc_results) == 1:
+        response.expression = calc_results[0][0]
+        response.result = float(calc_results[0][1])
+    elif expression and not response.expression:
         response.expression = expression
-    if calc_result is not None and response.result is None:
-        response.result = float(calc_result)
 
-    state["current_response"] = response.dict()
+    state["current_response"] = response.model_dump()
     state["tools_used"] = tools_used
     state["next_step"] = "update_memory"
     return state
@@ -409,41 +852,41 @@ Include:
 # TODO: Implement the update_memory function.
 # This function updates the conversation history and manages the state after each interaction.
 # Refer to README.md Task 2.4 for detailed implementation requirements.
-def update_memory(state: AgentState) -> AgentState:
+def update_memory(state: AgentState) -> Dict[str, Any]:
     """
-    Update conversation memory
+    Update conversation memory.
+
+    Returns a partial update: the `add_messages` reducer appends the new turn
+    instead of the node copying the whole message history.
     """
-    # Track active documents from sources or document_ids if present
-    active_docs = []
+    # Track active documents from sources or document_ids if present,
+    # de-duplicated in first-seen order so citations stay stable
     resp = state.get("current_response") or {}
+    active_docs = []
     if isinstance(resp, dict):
-        if "sources" in resp and resp["sources"]:
-            active_docs.extend(resp["sources"])
-        if "document_ids" in resp and resp["document_ids"]:
-            active_docs.extend(resp["document_ids"])
+        active_docs = resp.get("sources") or resp.get("document_ids") or []
+
+    active_documents = list(dict.fromkeys(state.get("active_documents", []) + active_docs))
 
-    state["active_documents"] = list(set(state.get("active_documents", []) + active_docs))
+    # Keyed on the updated document set: asking again is a hit until the
+    # active documents change
+    if resp and state.get("intent") is not None:
+        _store_response(state, active_documents)
 
     # Prepare messages memory: add the last user input and assistant result as plain texts
-    from langchain_core.messages import HumanMessage, AIMessage
     user_msg = HumanMessage(content=state["user_input"]) 
-    assistant_msg_text = ""
-    if "answer" in resp:
-        assistant_msg_text = resp.get("answer", "")
-    elif "summary" in resp:
-        assistant_msg_text = resp.get("summary", "")
-    elif "explanation" in resp:
-        assistant_msg_text = resp.get("explanation", "")
+    assistant_msg_text = next((resp[k] for k in _ASSIST_KEYS if k in resp), "")
     assistant_msg = AIMessage(content=assistant_msg_text)
 
-    state["messages"] = state.get("messages", []) + [user_msg, assistant_msg]
-
     # Set next step to end
-    state["next_step"] = "end"
-    return state
+    return {
+        "active_documents": active_documents,
+        "messages": [user_msg, assistant_msg],
+        "next_step": "end",
+    }
 
 
-def should_continue(state: AgentState) -> Literal["qa_agent", "summarization_agent", "calculation_agent", "end"]:
+def should_continue(state: AgentState) -> Literal["qa_agent", "summarization_agent", "calculation_agent", "update_memory", "end"]:
     """
     Router function
     """
@@ -455,27 +898,89 @@ def should_continue(state: AgentState) -> Literal["qa_agent", "summarization_age
 def create_workflow(llm, tools):
     """
     Creates the LangGraph workflow
+
+    Compiled graphs are cached by the identity of `llm` and of each tool, so
+    repeated calls with the same objects share one graph.
+    """
+    key = (id(llm), tuple(id(t) for t in tools))
+    with _compiled_graph_cache_lock:
+        entry = _compiled_graph_cache.get(key)
+        if entry is not None:
+            _compiled_graph_cache.move_to_end(key)
+            return entry[2]
+
+    workflow = _build_workflow(llm, tools)
+    with _compiled_graph_cache_lock:
+        # Keep llm and tools alive alongside the graph so their ids can't be
+        # reused by other objects while the entry exists
+        _compiled_graph_cache[key] = (llm, list(tools), workflow)
+        while len(_compiled_graph_cache) > _COMPILED_GRAPH_CACHE_SIZE:
+            _compiled_graph_cache.popitem(last=False)
+    return workflow
+
+
+def _build_workflow(llm, tools):
+    """
+    Builds and compiles the StateGraph for `create_workflow`
     """
     graph = StateGraph(AgentState)
 
+    # Bind tools and structured outputs once instead of on every turn
+    router_llm = llm.bind_tools(get_routing_tools() + tools)
+    qa_llm = llm.bind_tools(tools + [AnswerResponse])
+    summarization_llm = llm.bind_tools(tools + [SummarizationResponse])
+    calculation_llm = llm.bind_tools(tools + [CalculationResponse])
+
+    # Strict JSON-schema structured outputs: the schema is sent as a response
+    # format and the provider guarantees output matching it, so there is no
+    # parse-and-retry on loose JSON
+    structured = {
+        name: llm.with_structured_output(schema, method="json_schema", strict=True)
+        for name, schema in (
+            ("intent_batch", IntentBatch),
+            ("answer", AnswerResponse),
+            ("summary", SummarizationResponse),
+            ("calculation", CalculationResponse),
+        )
+    }
+
+    # Fallback classifications from concurrent turns share one LLM call
+    intent_batcher = IntentClassifierBatcher(
+        llm.bind(max_tokens=1, logprobs=True, top_logprobs=4),
+        structured["intent_batch"],
+    )
+
+    # Read-only name -> tool lookup shared by the agents
+    tools_by_name = MappingProxyType({t.name: t for t in tools})
+
     # Nodes
-    graph.add_node("classify_intent", lambda s: classify_intent(s, llm))
-    graph.add_node("qa_agent", lambda s: qa_agent(s, llm, tools))
-    graph.add_node("summarization_agent", lambda s: summarization_agent(s, llm, tools))
-    graph.add_node("calculation_agent", lambda s: calculation_agent(s, llm, tools))
+    graph.add_node(
+        "route_request",
+        lambda s: route_request(s, router_llm, intent_batcher),
+    )
+    graph.add_node("qa_agent", lambda s: qa_agent(s, qa_llm, structured["answer"], tools_by_name))
+    graph.add_node(
+        "summarization_agent",
+        lambda s: summarization_agent(s, summarization_llm, structured["summary"], tools_by_name),
+    )
+    graph.add_node(
+        "calculation_agent",
+        lambda s: calculation_agent(s, calculation_llm, structured["calculation"], tools_by_name),
+    )
     graph.add_node("update_memory", update_memory)
 
     # Entry
-    graph.set_entry_point("classify_intent")
+    graph.set_entry_point("route_request")
 
     # Routing
     graph.add_conditional_edges(
-        "classify_intent",
+        "route_request",
         should_continue,
         {
             "qa_agent": "qa_agent",
             "summarization_agent": "summarization_agent",
             "calculation_agent": "calculation_agent",
+            "update_memory": "update_memory",
             "end": END,
         },
     )
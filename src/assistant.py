@@ -14,16 +14,17 @@ Example:
 
 import os
 import json
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterator, List, Optional
 from datetime import datetime
 import uuid
 
+from langchain_core.messages import AIMessage, AIMessageChunk
 from langchain_openai import ChatOpenAI
 
 from schemas import SessionState, ConversationTurn
 from retrieval import SimulatedRetriever
 from tools import get_all_tools, ToolLogger
-from agent import create_workflow, AgentState
+from agent import create_workflow, partial_response_text, AgentState
 from prompts import MEMORY_SUMMARY_PROMPT
 
 
@@ -82,11 +83,9 @@ class DocumentAssistant:
             print(f"Started new session {session_id}")
 
 
-        # Create a new ToolLogger with session-specific logging
-        self.tool_logger = ToolLogger(logs_dir="./logs", session_id=session_id)
-        self.tools = get_all_tools(self.retriever, self.tool_logger)
-
-        # Recreate workflow with new tools
+        # Point the existing ToolLogger at session-specific logging; the tools
+        # keep their logger, so the compiled workflow is reused from the cache
+        self.tool_logger.start_session(session_id)
         self.workflow = create_workflow(self.llm, self.tools)
         
         return session_id
@@ -111,7 +110,7 @@ class DocumentAssistant:
                 f"{self.current_session.session_id}.json"
             )
             # Convert to dict and handle datetime serialization
-            session_dict = self.current_session.dict()
+            session_dict = self.current_session.model_dump()
             
             def serialize_datetime(obj):
                 if isinstance(obj, datetime):
@@ -153,19 +152,17 @@ class DocumentAssistant:
         
         return history_text
     
-    def process_message(self, user_input: str) -> Dict[str, Any]:
-        """
-        Process a user message.
-        """
+    def _build_initial_state(self, user_input: str) -> AgentState:
+        """Prepare the workflow input for a user message"""
         if not self.current_session:
             raise ValueError("No active session. Call start_session() first.")
         
-        # Prepare initial state
-        initial_state: AgentState = {
+        return {
             "messages": [],
             "user_input": user_input,
             "intent": None,
-            "next_step": "classify_intent",
+            "next_step": "route_request",
+            "planned_tool_calls": [],
             "conversation_history": self.current_session.conversation_history,
             "conversation_summary": self._get_conversation_summary(),
             "active_documents": self.current_session.document_context,
@@ -174,42 +171,97 @@ class DocumentAssistant:
             "session_id": self.current_session.session_id,
             "user_id": self.current_session.user_id
         }
+    
+    def _complete_turn(self, user_input: str, final_state: Dict[str, Any]) -> Dict[str, Any]:
+        """Record the finished turn in the session and build the result payload"""
+        # Update session with new turn
+        if final_state.get("current_response"):
+            turn = ConversationTurn(
+                user_input=user_input,
+                agent_response=final_state["current_response"],
+                intent=final_state.get("intent"),
+                tools_used=final_state.get("tools_used", [])
+            )
+            self.current_session.conversation_history.append(turn)
+            self.current_session.last_updated = datetime.now()
+            
+            # Update document context
+            if final_state.get("active_documents"):
+                self.current_session.document_context = list(dict.fromkeys(
+                    self.current_session.document_context + 
+                    final_state["active_documents"]
+                ))
+            
+            # Save session
+            self._save_session()
+        
+        # Return response
+        return {
+            "success": True,
+            "response": final_state.get("current_response"),
+            "intent": final_state.get("intent").model_dump() if final_state.get("intent") else None,
+            "tools_used": final_state.get("tools_used", [])
+        }
+    
+    def process_message(self, user_input: str) -> Dict[str, Any]:
+        """
+        Process a user message.
+        """
+        initial_state = self._build_initial_state(user_input)
         
         # Run the workflow
         try:
             final_state = self.workflow.invoke(initial_state)
+            return self._complete_turn(user_input, final_state)
             
-            # Update session with new turn
-            if final_state.get("current_response"):
-                turn = ConversationTurn(
-                    user_input=user_input,
-                    agent_response=final_state["current_response"],
-                    intent=final_state.get("intent"),
-                    tools_used=final_state.get("tools_used", [])
-                )
-                self.current_session.conversation_history.append(turn)
-                self.current_session.last_updated = datetime.now()
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "response": None
+            }
+    
+    def stream_message(self, user_input: str) -> Iterator[Dict[str, Any]]:
+        """
+        Process a user message, streaming the response text while it is generated.
+        
+        Yields `{"type": "partial", "text": ...}` events carrying the response
+        text produced so far (a later LLM pass may replace it, so render the
+        latest one), then a single `{"type": "final", ...}` event with the same
+        payload as `process_message`.
+        """
+        initial_state = self._build_initial_state(user_input)
+        
+        try:
+            final_state = None
+            partials: Dict[Optional[str], AIMessage] = {}
+            last_text = None
+            
+            for mode, data in self.workflow.stream(initial_state, stream_mode=["messages", "values"]):
+                if mode == "values":
+                    final_state = data
+                    continue
                 
-                # Update document context
-                if final_state.get("active_documents"):
-                    self.current_session.document_context = list(set(
-                        self.current_session.document_context + 
-                        final_state["active_documents"]
-                    ))
+                message, _ = data
+                if not isinstance(message, AIMessage):
+                    continue
                 
-                # Save session
-                self._save_session()
+                # Merge chunks of the same LLM call; tool call args are parsed
+                # from the partial JSON accumulated so far
+                if isinstance(message, AIMessageChunk) and message.id in partials:
+                    message = partials[message.id] + message
+                partials[message.id] = message
+                
+                text = partial_response_text(message)
+                if text and text != last_text:
+                    last_text = text
+                    yield {"type": "partial", "text": text}
             
-            # Return response
-            return {
-                "success": True,
-                "response": final_state.get("current_response"),
-                "intent": final_state.get("intent").dict() if final_state.get("intent") else None,
-                "tools_used": final_state.get("tools_used", [])
-            }
+            yield {"type": "final", **self._complete_turn(user_input, final_state)}
             
         except Exception as e:
-            return {
+            yield {
+                "type": "final",
                 "success": False,
                 "error": str(e),
                 "response": None
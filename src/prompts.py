@@ -1,7 +1,8 @@
 """Prompt templates for intent classification, chat system setup, and formatting.
 
 Includes:
-- Intent classification prompt (`get_intent_classification_prompt`)
+- Intent classification prompts (`get_intent_classification_prompt`,
+  `get_intent_letter_prompt`, `get_batch_intent_classification_prompt`)
 - Chat prompt selector (`get_chat_prompt_template`)
 - Memory summary and response formatting prompts
 
@@ -13,6 +14,20 @@ Example:
 from langchain.prompts import PromptTemplate, ChatPromptTemplate, MessagesPlaceholder
 from langchain.prompts.chat import SystemMessagePromptTemplate, HumanMessagePromptTemplate
 
+# Intent definitions and examples shared by the single and batch classification prompts
+INTENT_CLASSIFICATION_GUIDANCE = """Guidance:
+- qa: The user asks a specific question to be answered from documents.
+- summarization: The user asks to summarize one or more documents.
+- calculation: The user asks to compute, total, add, subtract, multiply, divide, or otherwise calculate values (often from invoices, contracts, or claims).
+- unknown: Anything else or ambiguous.
+
+Examples:
+1) "What's the total amount in invoice INV-001?" -> qa (confidence ~0.8+)
+2) "Summarize all contracts" -> summarization (confidence ~0.9)
+3) "Calculate the sum of all invoice totals" -> calculation (confidence ~0.9)
+4) "Tell me about our performance" -> unknown (confidence depends on context)
+"""
+
 # TODO: Implement the intent classification prompt.
 # This prompt should help the LLM classify user intents into qa, summarization, calculation, or unknown.
 # Refer to README.md Task 3.1 for detailed implementation requirements.
@@ -28,31 +43,66 @@ Provide:
 - confidence: a number between 0 and 1
 - reasoning: a brief explanation for your decision
 
-Guidance:
-- qa: The user asks a specific question to be answered from documents.
-- summarization: The user asks to summarize one or more documents.
-- calculation: The user asks to compute, total, add, subtract, multiply, divide, or otherwise calculate values (often from invoices, contracts, or claims).
-- unknown: Anything else or ambiguous.
+""" + INTENT_CLASSIFICATION_GUIDANCE + """
+Conversation History:
+{conversation_history}
 
-Examples:
-1) "What's the total amount in invoice INV-001?" -> qa (confidence ~0.8+)
-2) "Summarize all contracts" -> summarization (confidence ~0.9)
-3) "Calculate the sum of all invoice totals" -> calculation (confidence ~0.9)
-4) "Tell me about our performance" -> unknown (confidence depends on context)
+User Input:
+{user_input}
+
+Return the fields above.
+"""
+    return PromptTemplate(
+        input_variables=["user_input", "conversation_history"],
+        template=template,
+    )
+
+
+def get_intent_letter_prompt() -> PromptTemplate:
+    """
+    Get the intent classification prompt that asks for a one-letter answer
+    """
+    template = """You are an intent classification assistant for a document analysis system. 
+Classify the user's intent into one of: qa, summarization, calculation, or unknown.
 
+""" + INTENT_CLASSIFICATION_GUIDANCE + """
 Conversation History:
 {conversation_history}
 
 User Input:
 {user_input}
 
-Return the fields above.
+Reply with exactly one letter: Q (qa), S (summarization), C (calculation), or U (unknown).
 """
     return PromptTemplate(
         input_variables=["user_input", "conversation_history"],
         template=template,
     )
 
+
+def get_batch_intent_classification_prompt() -> PromptTemplate:
+    """
+    Get the prompt template for classifying several numbered requests at once
+    """
+    template = """You are an intent classification assistant for a document analysis system. 
+Classify EACH of the numbered requests below into one of: qa, summarization, calculation, or unknown.
+Requests are independent; use only each request's own conversation history.
+
+For every request provide:
+- intent_type: one of [qa, summarization, calculation, unknown]
+- confidence: a number between 0 and 1
+- reasoning: a brief explanation for your decision
+
+""" + INTENT_CLASSIFICATION_GUIDANCE + """
+{requests}
+
+Return exactly one classification per request, in the same order as the requests.
+"""
+    return PromptTemplate(
+        input_variables=["requests"],
+        template=template,
+    )
+
 # Q&A System Prompt
 QA_SYSTEM_PROMPT = """You are a helpful document assistant specializing in answering questions about financial and healthcare documents.
 
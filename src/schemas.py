@@ -14,6 +14,7 @@ Example:
 """
 
 from pydantic import BaseModel, Field
+from pydantic.json_schema import SkipJsonSchema
 from typing import List, Optional, Dict, Any, Literal
 from datetime import datetime
 
@@ -34,7 +35,9 @@ class AnswerResponse(BaseModel):
     answer: str = Field(description="The generated answer")
     sources: List[str] = Field(default_factory=list, description="List of source document IDs used")
     confidence: float = Field(ge=0.0, le=1.0, description="Confidence score between 0 and 1")
-    timestamp: datetime = Field(default_factory=datetime.now, description="When the response was generated")
+    # Kept out of the JSON schema so the LLM never has to fill it in (strict
+    # structured output marks every schema field as required)
+    timestamp: SkipJsonSchema[datetime] = Field(default_factory=datetime.now, description="When the response was generated")
 
 
 class SummarizationResponse(BaseModel):
@@ -43,7 +46,7 @@ class SummarizationResponse(BaseModel):
     summary: str = Field(description="The generated summary")
     key_points: List[str] = Field(description="List of key points extracted")
     document_ids: List[str] = Field(default_factory=list, description="Documents summarized")
-    timestamp: datetime = Field(default_factory=datetime.now)
+    timestamp: SkipJsonSchema[datetime] = Field(default_factory=datetime.now)
 
 
 class CalculationResponse(BaseModel):
@@ -52,7 +55,7 @@ class CalculationResponse(BaseModel):
     result: float = Field(description="The calculated result")
     explanation: str = Field(description="Step-by-step explanation")
     units: Optional[str] = Field(default=None, description="Units if applicable")
-    timestamp: datetime = Field(default_factory=datetime.now)
+    timestamp: SkipJsonSchema[datetime] = Field(default_factory=datetime.now)
 
 # TODO: Implement the UserIntent schema for intent classification.
 # This schema should include fields for intent_type, confidence, and reasoning.
@@ -64,6 +67,11 @@ class UserIntent(BaseModel):
     reasoning: str = Field(description="Explanation for the classification")
 
 
+class IntentBatch(BaseModel):
+    """Intent classifications for several requests, in request order"""
+    intents: List[UserIntent] = Field(description="One classification per request, in the same order as the requests")
+
+
 class ConversationTurn(BaseModel):
     """Represents a single turn in the conversation"""
     user_input: str
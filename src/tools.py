@@ -3,6 +3,7 @@
 Includes:
 - Calculator tool with strict validation and safe evaluation
 - Document search/reader/statistics tools backed by the in-memory retriever
+- Routing pseudo-tools the workflow uses to pick a task
 - `ToolLogger` for per-session, auto-saved usage logs
 
 Example:
@@ -16,6 +17,7 @@ from langchain.tools import tool
 from pydantic import BaseModel, Field
 import re
 import json
+import threading
 from datetime import datetime
 
 
@@ -26,6 +28,8 @@ class ToolLogger:
         self.logs = []
         self.logs_dir = logs_dir
         self.session_id = session_id
+        # Tools may be invoked concurrently, so guard the log list and file
+        self._lock = threading.Lock()
 
         # Make sure logs directory exists
         import os
@@ -38,6 +42,14 @@ class ToolLogger:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             self.log_file = os.path.join(logs_dir, f"tool_usage_{timestamp}.json")
 
+    def start_session(self, session_id: str):
+        """Switch to a session-specific log file and start a fresh log list"""
+        import os
+        with self._lock:
+            self.session_id = session_id
+            self.logs = []
+            self.log_file = os.path.join(self.logs_dir, f"session_{session_id}.json")
+
     def log_tool_use(self, tool_name: str, input_data: Dict[str, Any], output: Any):
         log_entry = {
             "timestamp": datetime.now().isoformat(),
@@ -45,10 +57,11 @@ class ToolLogger:
             "input": input_data,
             "output": str(output),
         }
-        self.logs.append(log_entry)
+        with self._lock:
+            self.logs.append(log_entry)
 
-        # Automatically save to persistent file
-        self._auto_save()
+            # Automatically save to persistent file
+            self._auto_save()
         return log_entry
 
     def _auto_save(self):
@@ -73,7 +86,7 @@ def create_calculator_tool(logger: ToolLogger):
     """
     Creates a calculator tool that safely evaluates basic mathematical expressions.
     Allowed: digits, spaces, parentheses, + - * / % **, decimal points.
-    Returns a string result and logs all invocations.
+    Returns a structured result dict and logs all invocations.
     """
 
     # Strict validation: only numbers, operators, parentheses, and whitespace
@@ -91,7 +104,7 @@ def create_calculator_tool(logger: ToolLogger):
         return True
 
     @tool
-    def calculator(expression: str) -> str:
+    def calculator(expression: str) -> Dict[str, Any]:
         """
         Evaluate a basic math expression.
 
@@ -99,29 +112,28 @@ def create_calculator_tool(logger: ToolLogger):
             expression: A mathematical expression using + - * / % ** and parentheses.
 
         Returns:
-            String containing the numeric result (e.g., "5" not 5).
+            {"expression": ..., "result": <number>} on success, or
+            {"expression": ..., "error": <message>} if the expression is invalid.
         """
         try:
             if not _is_safe_expression(expression):
                 msg = "Invalid or unsafe expression. Only basic math is allowed."
                 logger.log_tool_use("calculator", {"expression": expression}, {"error": msg})
-                return msg
+                return {"expression": expression, "error": msg}
 
             # Evaluate with an empty global/local scope
             result = eval(expression, {"__builtins__": {}}, {})
 
-            # Normalize to number-like string
+            # Normalize whole-number floats to int (e.g., 5 not 5.0)
             if isinstance(result, float) and result.is_integer():
-                result_str = str(int(result))
-            else:
-                result_str = str(result)
+                result = int(result)
 
-            logger.log_tool_use("calculator", {"expression": expression}, {"result": result_str})
-            return f"The result of the calculation is {result_str}."
+            logger.log_tool_use("calculator", {"expression": expression}, {"result": result})
+            return {"expression": expression, "result": result}
         except Exception as e:
             error_msg = f"Error evaluating expression: {str(e)}"
             logger.log_tool_use("calculator", {"expression": expression}, {"error": error_msg})
-            return error_msg
+            return {"expression": expression, "error": error_msg}
 
     return calculator
 
@@ -391,4 +403,47 @@ def get_all_tools(retriever, logger: ToolLogger) -> List:
         create_document_search_tool(retriever, logger),
         create_document_reader_tool(retriever, logger),
         create_document_statistics_tool(retriever, logger)
-    ]
\ No newline at end of file
+    ]
+
+
+def get_routing_tools() -> List:
+    """
+    Get the routing pseudo-tools used to pick the task for a request.
+
+    They are never executed: the workflow routes on which one the LLM calls.
+    """
+
+    @tool
+    def answer_question(query: str, confidence: float) -> str:
+        """
+        Route the request to question answering about document content.
+
+        Args:
+            query: The question to answer
+            confidence: Confidence in this routing choice, between 0 and 1
+        """
+        return query
+
+    @tool
+    def summarize(query: str, confidence: float) -> str:
+        """
+        Route the request to summarization of one or more documents.
+
+        Args:
+            query: What to summarize
+            confidence: Confidence in this routing choice, between 0 and 1
+        """
+        return query
+
+    @tool
+    def calculate(expression: str, confidence: float) -> str:
+        """
+        Route the request to a calculation over values (totals, sums, differences, ...).
+
+        Args:
+            expression: The calculation requested, in words or as a math expression
+            confidence: Confidence in this routing choice, between 0 and 1
+        """
+        return expression
+
+    return [answer_question, summarize, calculate]